@@ -1,80 +1,99 @@
-from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
 import sys
+import pyarrow as pa
+try:
+    from cyvcf2 import VCF
+except ImportError:
+    VCF = None
 from pysam import VariantFile
 from datafusion import SessionContext, col, functions as f, lit
 
+BATCH_SIZE = 65536
+READ_THREADS = 2
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+JAS_SCHEMA = pa.schema([("jas_id", pa.string()), ("jas_vid", pa.string())])
+
 def index_merged_variants(filename, tag):
-    with VariantFile(filename) as vcf:
+    with VariantFile(filename, threads=READ_THREADS) as vcf:
         idx = {}
+        rev = {}
         for rec in vcf:
             locus = (rec.chrom, rec.pos, rec.id)
-            vids = tuple(sorted(rec.info[tag]))
+            vids = frozenset(rec.info[tag])
             idx[vids] = locus
-        return idx
+            for vid in vids:
+                rev[vid] = vids
+        return idx, rev
 
-def index_original_variants(filename):
-    with VariantFile(filename) as vcf:
-        idx = {}
+def iter_records(filename):
+    if VCF is not None:
+        vcf = VCF(filename, threads=READ_THREADS)
+        try:
+            for rec in vcf:
+                info = rec.INFO
+                yield rec.ID, rec.CHROM, rec.start, info.get('SVTYPE'), info.get('SVLEN')
+        finally:
+            vcf.close()
+        return
+    with VariantFile(filename, threads=READ_THREADS) as vcf:
         for rec in vcf:
-            vid = rec.id
-            chrom = rec.chrom
-            start = rec.start
-            svtype = rec.info['SVTYPE']
-            svlen = 0
-            if "SVLEN" in rec.info:
-                svlen = int(rec.info['SVLEN'])
-            end = start
-            if svtype != "INS" and svtype != "BND":
-                end += abs(svlen)
-            idx[vid] = (chrom, start, end, svtype, svlen)
-        return idx
-
-def get_rec(vid, orig):
-    for idx in orig:
-        if vid in idx:
-            return idx[vid]
-    print(f'vid not found: {vid}')
-    return None
+            info = rec.info
+            yield rec.id, rec.chrom, rec.start, info['SVTYPE'], info.get("SVLEN", None)
 
 def get_variant_items(filename):
-    with VariantFile(filename) as vcf:
-        for rec in vcf:
-            item = {"vid": rec.id,
-                    "chrom": rec.chrom,
-                   "start": rec.start,
-                   "end": rec.start,
-                   "svtype": rec.info['SVTYPE'],
-                   "svlen": rec.info.get("SVLEN", None)}
-            if item["svlen"] is not None and item["svtype"] != "INS" and item["svtype"] != "BND":
-                item["end"] = item["start"] + abs(item["svlen"])
-            yield item
+    vids, chroms, starts, ends, svtypes, svlens = [], [], [], [], [], []
+    for vid, chrom, start, svtype, svlen in iter_records(filename):
+        end = start
+        if svlen is not None and svtype != "INS" and svtype != "BND":
+            end += abs(svlen)
+        vids.append(vid)
+        chroms.append(chrom)
+        starts.append(start)
+        ends.append(end)
+        svtypes.append(svtype)
+        svlens.append(svlen)
+    return pa.table({"vid": pa.array(vids, pa.string()),
+                     "chrom": pa.array(chroms, CATEGORY),
+                     "start": pa.array(starts, pa.int64()),
+                     "end": pa.array(ends, pa.int64()),
+                     "svtype": pa.array(svtypes, CATEGORY),
+                     "svlen": pa.array(svlens, pa.int64())})
+
+def batched(items, n):
+    items = iter(items)
+    while batch := list(islice(items, n)):
+        yield batch
+
+def to_record_batch(rows, schema):
+    columns = zip(*rows)
+    return pa.RecordBatch.from_arrays([pa.array(column, field.type) for column, field in zip(columns, schema)],
+                                      schema=schema)
 
 def get_variant_sets(filename, wanted, tag):
     print(f'loading {filename}')
-    with VariantFile(filename) as vcf:
+    with VariantFile(filename, threads=READ_THREADS) as vcf:
         for rec in vcf:
             id = rec.id
-            vids = rec.info.get(tag)
-            found = False
+            vids = rec.info.get(tag) or ()
+            if wanted.isdisjoint(vids):
+                continue
             for vid in vids:
-                if vid in wanted:
-                    found = True
-                    break
-            if found:
-                for vid in vids:
-                    yield {"jas_id": id, "jas_vid": vid}
+                yield id, vid
 
-svelt = index_merged_variants(sys.argv[3], "ORIGINAL_IDS")
-jasmine = index_merged_variants(sys.argv[4], "IDLIST")
-orig = list(map(index_original_variants, sys.argv[5:]))
+svelt, svelt_idx = index_merged_variants(sys.argv[3], "ORIGINAL_IDS")
+jasmine, jasmine_idx = index_merged_variants(sys.argv[4], "IDLIST")
 
-def write_differences_table(differences, full, name, tag):
-    ctx = SessionContext()
+ctx = SessionContext()
 
-    orig_df = ctx.from_pylist(list(chain(*map(get_variant_items, sys.argv[5:]))))
-    #orig_df.show()
+with ThreadPoolExecutor(max_workers=min(8, len(sys.argv[5:])) or 1) as ex:
+    orig_df = ctx.from_arrow(pa.concat_tables(list(ex.map(get_variant_items, sys.argv[5:]))))
+#orig_df.show()
 
-    jas_df = ctx.from_pylist(list(get_variant_sets(full, set().union(*differences), tag)))
+def write_differences_table(differences, full, name, tag):
+    items = get_variant_sets(full, set(chain.from_iterable(differences)), tag)
+    batches = [to_record_batch(batch, JAS_SCHEMA) for batch in batched(items, BATCH_SIZE)]
+    jas_df = ctx.create_dataframe([batches], schema=JAS_SCHEMA)
     #jas_df.show()
 
     wanted_df = jas_df.join(orig_df, left_on="jas_vid", right_on="vid")
@@ -96,23 +115,13 @@ def write_differences_table(differences, full, name, tag):
                     .with_column("length_ratio", col("len_min") * lit(1.0) / col("len_max"))
     summary.write_csv(name, True)
 
-svelt_idx = {}
-for vids in svelt.keys():
-    for vid in vids:
-        svelt_idx[vid] = vids
-
-jasmine_idx = {}
-for vids in jasmine.keys():
-    for vid in vids:
-        jasmine_idx[vid] = vids
-
 more_svelt = set()
 more_jasmine = set()
 for vid, svelt_vids in svelt_idx.items():
     jasmine_vids = jasmine_idx[vid]
     if svelt_vids == jasmine_vids:
         continue
-    if len(set(jasmine_vids) - set(svelt_vids)) > 0:
+    if not svelt_vids.issuperset(jasmine_vids):
         more_jasmine.add(jasmine_vids)
     else:
         more_svelt.add(svelt_vids)
@@ -1,38 +1,103 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import shutil
+import subprocess
 import sys
 
+try:
+    from cyvcf2 import VCF
+except ImportError:
+    VCF = None
 from pysam import VariantFile
 
+BCFTOOLS = shutil.which("bcftools")
+
+def bcftools_query(filename, fmt):
+    with subprocess.Popen([BCFTOOLS, "query", "-f", fmt, filename],
+                          stdout=subprocess.PIPE, bufsize=1 << 20) as p:
+        for line in p.stdout:
+            yield line[:-1]
+    if p.returncode != 0:
+        raise subprocess.CalledProcessError(p.returncode, p.args)
+
 def scan_ids(filename):
+    if BCFTOOLS is not None:
+        for vid in bcftools_query(filename, "%ID\n"):
+            if vid != b".":
+                yield vid
+        return
+    if VCF is not None:
+        vcf = VCF(filename, lazy=True)
+        try:
+            for rec in vcf:
+                if rec.ID is not None:
+                    yield rec.ID.encode()
+        finally:
+            vcf.close()
+        return
     with VariantFile(filename) as vcf:
         for rec in vcf:
             if rec.id is not None:
-                yield rec.id
+                yield rec.id.encode()
 
 def scan_ids_from_info(filename, tagname):
+    if BCFTOOLS is not None:
+        for vids in bcftools_query(filename, f"%INFO/{tagname}\n"):
+            if vids != b".":
+                yield vids.split(b",")
+        return
+    if VCF is not None:
+        vcf = VCF(filename)
+        try:
+            for rec in vcf:
+                vids = rec.INFO.get(tagname)
+                if vids is not None:
+                    yield vids.encode().split(b",")
+        finally:
+            vcf.close()
+        return
     with VariantFile(filename) as vcf:
         for rec in vcf:
-            yield rec.info.get(tagname)
+            vids = rec.info.get(tagname)
+            if vids is not None:
+                yield [vid.encode() for vid in vids]
 
-merged = set()
-for vids in scan_ids_from_info(sys.argv[1], "IDLIST"):
-    for vid in vids:
-        if vid in merged:
-            print(f'{sys.argv[1]}: variant ID {vid} already seen!')
-        merged.add(vid)
-
-seen = set()
-for filename in sys.argv[2:]:
+def load_ids(filename):
     single = set()
+    duplicates = []
     for vid in scan_ids(filename):
         if vid in single:
-            print(f'{filename}: variant ID {vid} already seen!')
+            duplicates.append(vid)
         single.add(vid)
+    return single, duplicates
+
+def report_duplicates(filename, duplicates):
+    if duplicates:
+        print(f'{filename}: {len(duplicates)} variant IDs already seen: {sorted(vid.decode() for vid in duplicates)}')
+
+def main():
+    merged = set()
+    duplicates = []
+    for vids in scan_ids_from_info(sys.argv[1], "IDLIST"):
+        for vid in vids:
+            if vid in merged:
+                duplicates.append(vid)
+            merged.add(vid)
+    report_duplicates(sys.argv[1], duplicates)
+
+    filenames = sys.argv[2:]
+    workers = min(len(filenames), os.cpu_count() or 1) or 1
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for filename, (single, duplicates) in zip(filenames, ex.map(load_ids, filenames)):
+            report_duplicates(filename, duplicates)
+
+            missing_from_merged = single - merged
+            if missing_from_merged:
+                print(f'{filename} had IDs that are missing from the merged VCF: {sorted(vid.decode() for vid in missing_from_merged)}')
+            merged -= single
 
-    here = merged & single
-    if here != single:
-        missing_from_merged = single - here
-        print(f'{filename} had IDs that are missing from the merged VCF: {sorted(missing_from_merged)}')
-    merged -= single
+    if len(merged):
+        print(f'Merged had IDs not in singles: {sorted(vid.decode() for vid in merged)}')
 
-if len(merged):
-    print(f'Merged had IDs not in singles: {sorted(merged)}')
\ No newline at end of file
+if __name__ == "__main__":
+    main()